@@ -1,5 +1,5 @@
-import queue
 import asyncio
+import threading
 from mitmproxy import exceptions
 
 
@@ -27,7 +27,8 @@ class Channel:
                 self.master.addons.handle_lifecycle(mtype, m),
                 self.loop,
             )
-            g = m.reply.q.get()
+            m.reply.committed.wait()
+            g = m.reply.value
             if g == exceptions.Kill:
                 raise exceptions.Kill()
             return g
@@ -55,8 +56,9 @@ class Reply:
     """
     def __init__(self, obj):
         self.obj = obj
-        # Spawn an event loop in the current thread
-        self.q = queue.Queue()
+        # Set once the reply has been committed. The value is final from then on,
+        # so an event is all we need to hand it back to the waiting thread.
+        self.committed = threading.Event()
 
         self._state = "start"  # "start" -> "taken" -> "committed"
 
@@ -106,7 +108,7 @@ class Reply:
         if not self.has_message:
             raise exceptions.ControlException("There is no reply message.")
         self._state = "committed"
-        self.q.put(self.value)
+        self.committed.set()
 
     def ack(self, force=False):
         self.send(self.obj, force)
@@ -151,6 +153,7 @@ class DummyReply(Reply):
         if self._should_reset:
             self._state = "start"
             self.value = NO_REPLY
+            self.committed.clear()
 
     def __del__(self):
         pass
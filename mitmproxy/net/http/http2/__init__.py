@@ -1,8 +1,12 @@
 from mitmproxy.net.http.http2.framereader import read_raw_frame, parse_frame
-from mitmproxy.net.http.http2.utils import parse_headers
+from mitmproxy.net.http.http2.utils import parse_headers, split_pseudo_headers
+from mitmproxy.net.http.http2.utils import REQUEST_PSEUDO_HEADERS, RESPONSE_PSEUDO_HEADERS
 
 __all__ = [
     "read_raw_frame",
     "parse_frame",
     "parse_headers",
+    "split_pseudo_headers",
+    "REQUEST_PSEUDO_HEADERS",
+    "RESPONSE_PSEUDO_HEADERS",
 ]
@@ -1,12 +1,10 @@
-import codecs
-
 import hyperframe.frame
 from mitmproxy import exceptions
 
 
 def read_raw_frame(rfile):
     header = rfile.safe_read(9)
-    length = int(codecs.encode(header[:3], 'hex_codec'), 16)
+    length = int.from_bytes(header[:3], "big")
 
     if length == 4740180:
         raise exceptions.HttpException("Length field looks more like HTTP/1.1:\n{}".format(rfile.read(-1)))
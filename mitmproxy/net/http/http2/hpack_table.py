@@ -0,0 +1,87 @@
+"""
+An HPACK header table with constant-time lookups for the pure-Python ``hpack`` encoder.
+
+``hpack.table.HeaderTable.search`` scans the static and the dynamic table linearly for every header
+that is encoded. ``IndexedHeaderTable`` keeps dicts that map ``(name, value)`` pairs and names to
+their entries, and updates them whenever an entry is added or evicted. Search results are identical
+to ``HeaderTable``'s, so the encoded header blocks do not change.
+"""
+from hpack.table import HeaderTable, table_entry_size
+
+
+def _index_static_table():
+    by_name_value = {}
+    by_name = {}
+    for index, (name, value) in enumerate(HeaderTable.STATIC_TABLE, 1):
+        # the first matching entry wins, just like in HeaderTable.search
+        by_name_value.setdefault((name, value), index)
+        by_name.setdefault(name, index)
+    return by_name_value, by_name
+
+
+class IndexedHeaderTable(HeaderTable):
+    STATIC_BY_NAME_VALUE, STATIC_BY_NAME = _index_static_table()
+
+    def __init__(self):
+        super().__init__()
+        # Dynamic entries are identified by their insertion sequence number. The newest entry
+        # has HPACK index STATIC_TABLE_LENGTH + 1, so an entry's index follows from its age.
+        self._inserted = 0
+        self._by_name_value = {}
+        self._by_name = {}
+
+    def _dynamic_index(self, seq):
+        return HeaderTable.STATIC_TABLE_LENGTH + self._inserted - seq
+
+    def _clear(self):
+        self.dynamic_entries.clear()
+        self._current_size = 0
+        self._by_name_value.clear()
+        self._by_name.clear()
+
+    def add(self, name, value):
+        size = table_entry_size(name, value)
+        if size > self._maxsize:
+            self._clear()
+        else:
+            seq = self._inserted
+            self._inserted += 1
+            self.dynamic_entries.appendleft((name, value))
+            self._by_name_value[(name, value)] = seq
+            self._by_name[name] = seq
+            self._current_size += size
+            self._shrink()
+
+    def search(self, name, value):
+        index = self.STATIC_BY_NAME_VALUE.get((name, value))
+        if index is not None:
+            return index, name, value
+        seq = self._by_name_value.get((name, value))
+        if seq is not None:
+            return self._dynamic_index(seq), name, value
+        index = self.STATIC_BY_NAME.get(name)
+        if index is not None:
+            return index, name, None
+        seq = self._by_name.get(name)
+        if seq is not None:
+            return self._dynamic_index(seq), name, None
+        return None
+
+    @HeaderTable.maxsize.setter
+    def maxsize(self, newmax):
+        HeaderTable.maxsize.fset(self, newmax)
+        if not self.dynamic_entries:
+            self._clear()
+
+    def _shrink(self):
+        cursize = self._current_size
+        while cursize > self._maxsize:
+            seq = self._inserted - len(self.dynamic_entries)
+            name, value = self.dynamic_entries.pop()
+            cursize -= table_entry_size(name, value)
+            # only forget the entry if no newer entry has taken its place
+            if self._by_name_value.get((name, value)) == seq:
+                del self._by_name_value[(name, value)]
+            if self._by_name.get(name) == seq:
+                del self._by_name[name]
+        self._current_size = cursize
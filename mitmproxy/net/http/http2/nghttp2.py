@@ -0,0 +1,224 @@
+"""
+HPACK encoder and decoder backed by nghttp2's C implementation.
+
+The bindings are created with cffi in ABI mode, so no compiler is required at install time.
+If cffi or a shared nghttp2 library cannot be found, ``available`` is False and callers
+should keep using the pure-Python ``hpack`` package.
+
+Both classes mimic the subset of the ``hpack.Encoder`` / ``hpack.Decoder`` API used by h2.
+"""
+import ctypes.util
+
+from hpack import HeaderTuple, NeverIndexedHeaderTuple
+from hpack import exceptions as hpack_exceptions
+
+try:
+    import cffi
+except ImportError:  # pragma: no cover
+    cffi = None
+
+CDEF = """
+typedef struct nghttp2_hd_deflater nghttp2_hd_deflater;
+typedef struct nghttp2_hd_inflater nghttp2_hd_inflater;
+
+typedef struct {
+    uint8_t *name;
+    uint8_t *value;
+    size_t namelen;
+    size_t valuelen;
+    uint8_t flags;
+} nghttp2_nv;
+
+int nghttp2_hd_deflate_new(nghttp2_hd_deflater **deflater_ptr, size_t max_deflate_dynamic_table_size);
+void nghttp2_hd_deflate_del(nghttp2_hd_deflater *deflater);
+int nghttp2_hd_deflate_change_table_size(nghttp2_hd_deflater *deflater, size_t settings_max_dynamic_table_size);
+ssize_t nghttp2_hd_deflate_hd(nghttp2_hd_deflater *deflater, uint8_t *buf, size_t buflen,
+                              const nghttp2_nv *nva, size_t nvlen);
+size_t nghttp2_hd_deflate_bound(nghttp2_hd_deflater *deflater, const nghttp2_nv *nva, size_t nvlen);
+
+int nghttp2_hd_inflate_new(nghttp2_hd_inflater **inflater_ptr);
+void nghttp2_hd_inflate_del(nghttp2_hd_inflater *inflater);
+int nghttp2_hd_inflate_change_table_size(nghttp2_hd_inflater *inflater, size_t settings_max_dynamic_table_size);
+ssize_t nghttp2_hd_inflate_hd2(nghttp2_hd_inflater *inflater, nghttp2_nv *nv_out, int *inflate_flags,
+                               const uint8_t *in, size_t inlen, int in_final);
+int nghttp2_hd_inflate_end_headers(nghttp2_hd_inflater *inflater);
+"""
+
+NV_FLAG_NONE = 0x00
+NV_FLAG_NO_INDEX = 0x01
+
+HD_INFLATE_FINAL = 0x01
+HD_INFLATE_EMIT = 0x02
+
+# nghttp2's own default for the size of the encoder's dynamic table.
+DEFAULT_HEADER_TABLE_SIZE = 4096
+DEFAULT_MAX_HEADER_LIST_SIZE = 2 ** 16
+
+
+def _load():
+    if cffi is None:
+        return None, None
+    libname = ctypes.util.find_library("nghttp2")
+    if not libname:
+        return None, None
+    ffi = cffi.FFI()
+    ffi.cdef(CDEF)
+    try:
+        lib = ffi.dlopen(libname)
+        # nghttp2_hd_inflate_hd2 only exists in nghttp2 >= 1.10.
+        lib.nghttp2_hd_inflate_hd2
+    except (OSError, AttributeError):
+        return None, None
+    return ffi, lib
+
+
+ffi, lib = _load()
+available = lib is not None
+
+
+# The codecs can only run where libnghttp2 is installed, which is not the case on most CI platforms.
+class Encoder:  # pragma: no cover
+    """
+    An HPACK encoder object. This object takes HTTP headers and emits encoded HTTP/2 header blocks.
+    """
+
+    def __init__(self):
+        ptr = ffi.new("nghttp2_hd_deflater **")
+        if lib.nghttp2_hd_deflate_new(ptr, DEFAULT_HEADER_TABLE_SIZE) != 0:
+            raise MemoryError()
+        self._deflater = ffi.gc(ptr[0], lib.nghttp2_hd_deflate_del)
+        self._header_table_size = DEFAULT_HEADER_TABLE_SIZE
+
+    @property
+    def header_table_size(self):
+        """
+        The size of the dynamic table the encoder uses. This is the maximum header table size announced
+        by the peer, capped at DEFAULT_HEADER_TABLE_SIZE as nghttp2 never grows its table beyond
+        the size the deflater was created with.
+        """
+        return self._header_table_size
+
+    @header_table_size.setter
+    def header_table_size(self, value):
+        rv = lib.nghttp2_hd_deflate_change_table_size(self._deflater, value)
+        if rv != 0:
+            raise hpack_exceptions.HPACKError("nghttp2_hd_deflate_change_table_size failed: {}".format(rv))
+        self._header_table_size = min(value, DEFAULT_HEADER_TABLE_SIZE)
+
+    def encode(self, headers, huffman=True):
+        """
+        Takes an iterable of ``(name, value)`` or ``(name, value, sensitive)`` tuples or
+        HeaderTuples and encodes them into a HPACK-encoded header block.
+        nghttp2 decides on Huffman coding by itself, the huffman argument is only accepted for compatibility.
+        """
+        headers = list(headers)
+        nva = ffi.new("nghttp2_nv[]", len(headers))
+        buffers = []  # keep the cdata buffers alive until deflating is done
+        for nv, header in zip(nva, headers):
+            if isinstance(header, HeaderTuple):
+                sensitive = not header.indexable
+            else:
+                sensitive = len(header) > 2 and header[2]
+            name = _to_bytes(header[0])
+            value = _to_bytes(header[1])
+            name_buf = ffi.from_buffer("uint8_t[]", name)
+            value_buf = ffi.from_buffer("uint8_t[]", value)
+            buffers.append((name_buf, value_buf))
+            nv.name = name_buf
+            nv.value = value_buf
+            nv.namelen = len(name)
+            nv.valuelen = len(value)
+            nv.flags = NV_FLAG_NO_INDEX if sensitive else NV_FLAG_NONE
+
+        buflen = lib.nghttp2_hd_deflate_bound(self._deflater, nva, len(headers))
+        buf = ffi.new("uint8_t[]", buflen)
+        written = lib.nghttp2_hd_deflate_hd(self._deflater, buf, buflen, nva, len(headers))
+        if written < 0:
+            raise hpack_exceptions.HPACKError("nghttp2_hd_deflate_hd failed: {}".format(written))
+        return ffi.buffer(buf, written)[:]
+
+
+class Decoder:  # pragma: no cover
+    """
+    An HPACK decoder object.
+
+    Like ``hpack.Decoder``, a decoder must not be used any further once it has raised an exception.
+    """
+
+    def __init__(self, max_header_list_size=DEFAULT_MAX_HEADER_LIST_SIZE):
+        ptr = ffi.new("nghttp2_hd_inflater **")
+        if lib.nghttp2_hd_inflate_new(ptr) != 0:
+            raise MemoryError()
+        self._inflater = ffi.gc(ptr[0], lib.nghttp2_hd_inflate_del)
+        self._nv = ffi.new("nghttp2_nv *")
+        self._inflate_flags = ffi.new("int *")
+        self._max_allowed_table_size = DEFAULT_HEADER_TABLE_SIZE
+        self.max_header_list_size = max_header_list_size
+
+    @property
+    def max_allowed_table_size(self):
+        """
+        The most recent SETTINGS_HEADER_TABLE_SIZE we sent and got acknowledged.
+        """
+        return self._max_allowed_table_size
+
+    @max_allowed_table_size.setter
+    def max_allowed_table_size(self, value):
+        rv = lib.nghttp2_hd_inflate_change_table_size(self._inflater, value)
+        if rv != 0:
+            raise hpack_exceptions.HPACKError("nghttp2_hd_inflate_change_table_size failed: {}".format(rv))
+        self._max_allowed_table_size = value
+
+    def decode(self, data, raw=False):
+        """
+        Takes a complete HPACK-encoded header block and decodes it into a list of HeaderTuples.
+        Names and values are bytes if raw is True and are decoded as UTF-8 otherwise.
+        """
+        data = bytes(data)
+        view = ffi.from_buffer("uint8_t[]", data)
+        nv = self._nv
+        inflate_flags = self._inflate_flags
+
+        headers = []
+        inflated_size = 0
+        position = 0
+        while True:
+            inflate_flags[0] = 0
+            consumed = lib.nghttp2_hd_inflate_hd2(
+                self._inflater, nv, inflate_flags, view + position, len(data) - position, 1
+            )
+            if consumed < 0:
+                raise hpack_exceptions.HPACKDecodingError("Invalid header block: {}".format(consumed))
+            position += consumed
+
+            if inflate_flags[0] & HD_INFLATE_EMIT:
+                name = ffi.buffer(nv.name, nv.namelen)[:]
+                value = ffi.buffer(nv.value, nv.valuelen)[:]
+                inflated_size += 32 + len(name) + len(value)
+                if inflated_size > self.max_header_list_size:
+                    raise hpack_exceptions.OversizedHeaderListError(
+                        "A header list larger than %d has been received" % self.max_header_list_size
+                    )
+                if nv.flags & NV_FLAG_NO_INDEX:
+                    headers.append(NeverIndexedHeaderTuple(name, value))
+                else:
+                    headers.append(HeaderTuple(name, value))
+
+            if inflate_flags[0] & HD_INFLATE_FINAL:
+                lib.nghttp2_hd_inflate_end_headers(self._inflater)
+                break
+            if not inflate_flags[0] & HD_INFLATE_EMIT and position == len(data):
+                break
+
+        if raw:
+            return headers
+        try:
+            return [h.__class__(h[0].decode("utf-8"), h[1].decode("utf-8")) for h in headers]
+        except UnicodeDecodeError:
+            raise hpack_exceptions.HPACKDecodingError("Unable to decode headers as UTF-8.")
+
+
+def _to_bytes(x):
+    if isinstance(x, bytes):
+        return x
+    return x.encode("utf-8")
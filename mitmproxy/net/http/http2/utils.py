@@ -35,3 +35,33 @@ def parse_headers(headers):
     port = int(port)
 
     return first_line_format, method, scheme, host, port, path
+
+
+REQUEST_PSEUDO_HEADERS = frozenset((b":authority", b":method", b":scheme", b":path"))
+RESPONSE_PSEUDO_HEADERS = frozenset((b":status",))
+
+
+def split_pseudo_headers(fields, names):
+    """
+    Separates the given HTTP/2 pseudo-headers from the other header fields in a single pass.
+
+    Args:
+        fields: ``(name, value)`` header byte tuples, e.g. ``Headers.fields``.
+        names: lowercase pseudo-header names to extract, e.g. ``REQUEST_PSEUDO_HEADERS``.
+
+    Returns:
+        A ``(pseudo_headers, fields)`` tuple: a dict mapping each extracted name to its value,
+        and a tuple of all remaining header fields in their original order. Unknown pseudo-headers
+        (e.g. ``:protocol``) are kept in the remaining fields. Like ``Headers.pop``, names are
+        matched case-insensitively and repeated values are folded into one.
+    """
+    values = {}
+    regular_fields = []
+    for field in fields:
+        name = field[0]
+        if name[:1] == b":" and name.lower() in names:
+            values.setdefault(name.lower(), []).append(field[1])
+        else:
+            regular_fields.append(field)
+    pseudo_headers = {name: b", ".join(v) for name, v in values.items()}
+    return pseudo_headers, tuple(regular_fields)
@@ -1,6 +1,7 @@
 import os
 import errno
 import select
+import selectors
 import socket
 import sys
 import threading
@@ -107,7 +108,8 @@ class Reader(_FileLike):
         """
             If length is -1, we read until connection closes.
         """
-        result = b''
+        # collect the chunks and join them once: growing a bytes object copies everything read so far on every chunk
+        chunks = []
         start = time.time()
         while length == -1 or length > 0:
             if length == -1 or length > self.BLOCKSIZE:
@@ -145,9 +147,10 @@ class Reader(_FileLike):
             self.first_byte_timestamp = self.first_byte_timestamp or time.time()
             if not data:
                 break
-            result += data
+            chunks.append(data)
             if length != -1:
                 length -= len(data)
+        result = b''.join(chunks)
         self.add_log(result)
         return result
 
@@ -208,6 +211,14 @@ class Reader(_FileLike):
             raise NotImplementedError("Can only peek into (pyOpenSSL) sockets")
 
 
+def ssl_pending(conn) -> bool:
+    """
+    Returns True if conn is an SSL.Connection that already holds decrypted data.
+    Such data is invisible to select() and friends.
+    """
+    return isinstance(conn, SSL.Connection) and conn.pending() > 0
+
+
 def ssl_read_select(rlist, timeout):
     """
     This is a wrapper around select.select() which also works for SSL.Connections
@@ -224,11 +235,45 @@ def ssl_read_select(rlist, timeout):
         subset of rlist which is ready for reading.
     """
     return [
-        conn for conn in rlist
-        if isinstance(conn, SSL.Connection) and conn.pending() > 0
+        conn for conn in rlist if ssl_pending(conn)
     ] or select.select(rlist, (), (), timeout)[0]
 
 
+class SSLReadSelector:
+    """
+    A persistent counterpart to ssl_read_select().
+
+    The connections are registered once with a selectors.DefaultSelector (epoll/kqueue where available)
+    instead of being handed to select() again on every call. The same caveats as for ssl_read_select apply.
+    """
+
+    def __init__(self, rlist):
+        self.rlist = list(rlist)
+        self.selector = selectors.DefaultSelector()
+        for conn in self.rlist:
+            self.selector.register(conn, selectors.EVENT_READ)
+
+    def select(self, timeout):
+        """
+        Returns:
+            subset of the registered connections which is ready for reading.
+        """
+        return [
+            conn for conn in self.rlist if ssl_pending(conn)
+        ] or [
+            key.fileobj for key, _ in self.selector.select(timeout)
+        ]
+
+    def close(self):
+        self.selector.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
 def close_socket(sock):
     """
     Does a hard close of a socket, without emitting a RST.
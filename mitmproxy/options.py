@@ -110,6 +110,13 @@ class Options(optmanager.OptManager):
             with misbehaving servers.
             """
         )
+        self.add_option(
+            "http2_nghttp2", bool, True,
+            """
+            Use libnghttp2 for HTTP/2 header compression if it is installed.
+            Disable to force the pure-Python HPACK implementation.
+            """
+        )
         self.add_option(
             "websocket", bool, True,
             "Enable/disable WebSocket support. "
@@ -1,12 +1,12 @@
+import collections
 import threading
 import time
 import functools
-from typing import Dict, Callable, Any, List, Optional  # noqa
+from typing import Deque, Dict, Callable, Any, List, Optional  # noqa
 
 import h2.exceptions
 from h2 import connection
 from h2 import events
-import queue
 
 from mitmproxy import connections, flow  # noqa
 from mitmproxy import exceptions
@@ -17,23 +17,26 @@ import mitmproxy.net.http
 from mitmproxy.net import tcp
 from mitmproxy.coretypes import basethread
 from mitmproxy.net.http import http2, headers, url
+from mitmproxy.net.http.http2 import hpack_table, nghttp2
 from mitmproxy.utils import human
 
 
 class SafeH2Connection(connection.H2Connection):
+    # upper bound for the DATA frame payload safe_send_body queues and sends under a single lock acquisition
+    MAX_BATCH_SIZE = 64 * 1024
 
-    def __init__(self, conn, *args, **kwargs):
+    def __init__(self, conn, *args, use_nghttp2=True, **kwargs):
         super().__init__(*args, **kwargs)
         self.conn = conn
+        # This needs to be reentrant: the layer holds it while handling events that call the safe_* methods,
+        # and send_request_headers holds it across stream id allocation and safe_send_headers.
         self.lock = threading.RLock()
-
-    def safe_acknowledge_received_data(self, acknowledged_size: int, stream_id: int):
-        if acknowledged_size == 0:
-            return
-
-        with self.lock:
-            self.acknowledge_received_data(acknowledged_size, stream_id)
-            self.conn.send(self.data_to_send())
+        if use_nghttp2 and nghttp2.available:
+            # use nghttp2's C implementation for HPACK (de)compression instead of the pure-Python one.
+            self.encoder = nghttp2.Encoder()
+            self.decoder = nghttp2.Decoder(max_header_list_size=self.decoder.max_header_list_size)
+        else:
+            self.encoder.header_table = hpack_table.IndexedHeaderTable()
 
     def safe_reset_stream(self, stream_id: int, error_code: int):
         with self.lock:
@@ -62,19 +65,27 @@ class SafeH2Connection(connection.H2Connection):
                 self.lock.acquire()
                 raise_zombie(self.lock.release)
                 max_outbound_frame_size = self.max_outbound_frame_size
-                frame_chunk = chunk[position:position + max_outbound_frame_size]
-                if self.local_flow_control_window(stream_id) < len(frame_chunk):  # pragma: no cover
+                # queue up to MAX_BATCH_SIZE bytes of DATA frames that the flow control window permits
+                # and write them in one go. The lock is released between batches, so that other streams
+                # and the layer thread do not have to wait for a large body to be sent completely.
+                batch_size = 0
+                while position < len(chunk) and batch_size < self.MAX_BATCH_SIZE:
+                    frame_chunk = chunk[position:position + max_outbound_frame_size]
+                    if self.local_flow_control_window(stream_id) < len(frame_chunk):
+                        break
+                    self.send_data(stream_id, frame_chunk)
+                    batch_size += len(frame_chunk)
+                    position += max_outbound_frame_size
+                if not batch_size:  # pragma: no cover
                     self.lock.release()
                     time.sleep(0.1)
                     continue
-                self.send_data(stream_id, frame_chunk)
                 try:
                     self.conn.send(self.data_to_send())
                 except Exception as e:  # pragma: no cover
                     raise e
                 finally:
                     self.lock.release()
-                position += max_outbound_frame_size
         if end_stream:
             with self.lock:
                 raise_zombie()
@@ -106,6 +117,18 @@ class Http2Layer(base.Layer):
         self.streams: Dict[int, Http2SingleStreamLayer] = dict()
         self.server_to_client_stream_ids: Dict[int, int] = dict([(0, 0)])
         self.connections: Dict[object, SafeH2Connection] = {}
+        self._event_handlers: Dict[type, Callable[..., bool]] = {
+            events.RequestReceived: self._handle_request_received,
+            events.ResponseReceived: self._handle_response_received,
+            events.DataReceived: self._handle_data_received,
+            events.StreamEnded: self._handle_stream_ended,
+            events.StreamReset: self._handle_stream_reset,
+            events.RemoteSettingsChanged: self._handle_remote_settings_changed,
+            events.ConnectionTerminated: self._handle_connection_terminated,
+            events.PushedStreamReceived: self._handle_pushed_stream_received,
+            events.PriorityUpdated: self._handle_priority_updated,
+            events.TrailersReceived: self._handle_trailers,
+        }
 
         config = h2.config.H2Configuration(
             client_side=False,
@@ -113,7 +136,8 @@ class Http2Layer(base.Layer):
             validate_outbound_headers=False,
             validate_inbound_headers=False,
             logger=self.H2ConnLogger("client", self.log))
-        self.connections[self.client_conn] = SafeH2Connection(self.client_conn, config=config)
+        self.connections[self.client_conn] = SafeH2Connection(
+            self.client_conn, use_nghttp2=self.config.options.http2_nghttp2, config=config)
 
     def _initiate_server_conn(self):
         if self.server_conn.connected():
@@ -123,7 +147,8 @@ class Http2Layer(base.Layer):
                 validate_outbound_headers=False,
                 validate_inbound_headers=False,
                 logger=self.H2ConnLogger("server", self.log))
-            self.connections[self.server_conn] = SafeH2Connection(self.server_conn, config=config)
+            self.connections[self.server_conn] = SafeH2Connection(
+                self.server_conn, use_nghttp2=self.config.options.http2_nghttp2, config=config)
         self.connections[self.server_conn].initiate_connection()
         self.server_conn.send(self.connections[self.server_conn].data_to_send())
 
@@ -152,98 +177,90 @@ class Http2Layer(base.Layer):
             else:
                 eid = event.stream_id
 
-        if isinstance(event, events.RequestReceived):
-            return self._handle_request_received(eid, event)
-        elif isinstance(event, events.ResponseReceived):
-            return self._handle_response_received(eid, event)
-        elif isinstance(event, events.DataReceived):
-            return self._handle_data_received(eid, event, source_conn)
-        elif isinstance(event, events.StreamEnded):
-            return self._handle_stream_ended(eid)
-        elif isinstance(event, events.StreamReset):
-            return self._handle_stream_reset(eid, event, is_server, other_conn)
-        elif isinstance(event, events.RemoteSettingsChanged):
-            return self._handle_remote_settings_changed(event, other_conn)
-        elif isinstance(event, events.ConnectionTerminated):
-            return self._handle_connection_terminated(event, is_server)
-        elif isinstance(event, events.PushedStreamReceived):
-            return self._handle_pushed_stream_received(event)
-        elif isinstance(event, events.PriorityUpdated):
-            return self._handle_priority_updated(eid, event)
-        elif isinstance(event, events.TrailersReceived):
-            return self._handle_trailers(eid, event, is_server, other_conn)
-
-        # fail-safe for unhandled events
-        return True
+        handler = self._event_handlers.get(type(event))
+        if handler is None:
+            # fail-safe for unhandled events
+            return True
+        return handler(eid, event, source_conn, other_conn, is_server)
 
-    def _handle_request_received(self, eid, event):
-        headers = mitmproxy.net.http.Headers([[k, v] for k, v in event.headers])
-        self.streams[eid] = Http2SingleStreamLayer(self, self.connections[self.client_conn], eid, headers)
-        self.streams[eid].timestamp_start = time.time()
+    def _handle_request_received(self, eid, event, source_conn, other_conn, is_server):
+        headers = mitmproxy.net.http.Headers(event.headers)
+        stream = Http2SingleStreamLayer(self, self.connections[self.client_conn], eid, headers)
+        self.streams[eid] = stream
+        stream.timestamp_start = time.time()
         if event.priority_updated is not None:
-            self.streams[eid].priority_exclusive = event.priority_updated.exclusive
-            self.streams[eid].priority_depends_on = event.priority_updated.depends_on
-            self.streams[eid].priority_weight = event.priority_updated.weight
-            self.streams[eid].handled_priority_event = event.priority_updated
-        self.streams[eid].start()
-        self.streams[eid].request_message.arrived.set()
+            stream.priority_exclusive = event.priority_updated.exclusive
+            stream.priority_depends_on = event.priority_updated.depends_on
+            stream.priority_weight = event.priority_updated.weight
+            stream.handled_priority_event = event.priority_updated
+        stream.start()
+        stream.request_message.arrived.set()
         return True
 
-    def _handle_response_received(self, eid, event):
-        headers = mitmproxy.net.http.Headers([[k, v] for k, v in event.headers])
-        self.streams[eid].queued_data_length = 0
-        self.streams[eid].timestamp_start = time.time()
-        self.streams[eid].response_message.headers = headers
-        self.streams[eid].response_message.arrived.set()
+    def _handle_response_received(self, eid, event, source_conn, other_conn, is_server):
+        headers = mitmproxy.net.http.Headers(event.headers)
+        stream = self.streams[eid]
+        stream.queued_data_length = 0
+        stream.timestamp_start = time.time()
+        stream.response_message.headers = headers
+        stream.response_message.arrived.set()
         return True
 
-    def _handle_data_received(self, eid, event, source_conn):
+    def _handle_data_received(self, eid, event, source_conn, other_conn, is_server):
+        stream = self.streams[eid]
+        source_h2_conn = self.connections[source_conn]
         bsl = human.parse_size(self.config.options.body_size_limit)
-        if bsl and self.streams[eid].queued_data_length > bsl:
-            self.streams[eid].kill()
-            self.connections[source_conn].safe_reset_stream(
+        if bsl and stream.queued_data_length > bsl:
+            stream.kill()
+            source_h2_conn.safe_reset_stream(
                 event.stream_id,
                 h2.errors.ErrorCodes.REFUSED_STREAM
             )
             self.log("HTTP body too large. Limit is {}.".format(bsl), "info")
         else:
-            self.streams[eid].data_queue.put(event.data)
-            self.streams[eid].queued_data_length += len(event.data)
-
-        # always acknowledge receved data with a WINDOW_UPDATE frame
-        self.connections[source_conn].safe_acknowledge_received_data(
-            event.flow_controlled_length,
-            event.stream_id
-        )
+            stream.put_data(event.data)
+            stream.queued_data_length += len(event.data)
+
+        # always acknowledge receved data with a WINDOW_UPDATE frame.
+        # _process_frame holds the lock and sends it along with everything else queued for this frame.
+        if event.flow_controlled_length:
+            source_h2_conn.acknowledge_received_data(
+                event.flow_controlled_length,
+                event.stream_id
+            )
         return True
 
-    def _handle_stream_ended(self, eid):
-        self.streams[eid].timestamp_end = time.time()
-        self.streams[eid].stream_ended.set()
+    def _handle_stream_ended(self, eid, event, source_conn, other_conn, is_server):
+        stream = self.streams[eid]
+        stream.timestamp_end = time.time()
+        stream.stream_ended.set()
+        # wake up the stream thread right away instead of waiting for its poll timeout
+        stream.data_available.set()
         return True
 
-    def _handle_stream_reset(self, eid, event, is_server, other_conn):
-        if eid in self.streams:
-            self.streams[eid].kill()
+    def _handle_stream_reset(self, eid, event, source_conn, other_conn, is_server):
+        stream = self.streams.get(eid)
+        if stream is not None:
+            stream.kill()
             if is_server:
-                other_stream_id = self.streams[eid].client_stream_id
+                other_stream_id = stream.client_stream_id
             else:
-                other_stream_id = self.streams[eid].server_stream_id
+                other_stream_id = stream.server_stream_id
             if other_stream_id is not None:
                 self.connections[other_conn].safe_reset_stream(other_stream_id, event.error_code)
         return True
 
-    def _handle_trailers(self, eid, event, is_server, other_conn):
-        trailers = mitmproxy.net.http.Headers([[k, v] for k, v in event.headers])
+    def _handle_trailers(self, eid, event, source_conn, other_conn, is_server):
+        trailers = mitmproxy.net.http.Headers(event.headers)
         self.streams[eid].trailers = trailers
         return True
 
-    def _handle_remote_settings_changed(self, event, other_conn):
+    def _handle_remote_settings_changed(self, eid, event, source_conn, other_conn, is_server):
         new_settings = dict([(key, cs.new_value) for (key, cs) in event.changed_settings.items()])
         self.connections[other_conn].safe_update_settings(new_settings)
         return True
 
-    def _handle_connection_terminated(self, event, is_server):
+    def _handle_connection_terminated(self, eid, event, source_conn, other_conn, is_server):
         self.log("HTTP/2 connection terminated by {}: error code: {}, last stream id: {}, additional data: {}".format(
             "server" if is_server else "client",
             event.error_code,
@@ -266,64 +283,69 @@ class Http2Layer(base.Layer):
             """
         return False
 
-    def _handle_pushed_stream_received(self, event):
+    def _handle_pushed_stream_received(self, eid, event, source_conn, other_conn, is_server):
         # pushed stream ids should be unique and not dependent on race conditions
         # only the parent stream id must be looked up first
 
         parent_eid = self.server_to_client_stream_ids[event.parent_stream_id]
-        with self.connections[self.client_conn].lock:
-            self.connections[self.client_conn].push_stream(parent_eid, event.pushed_stream_id, event.headers)
-            self.client_conn.send(self.connections[self.client_conn].data_to_send())
+        client_h2_conn = self.connections[self.client_conn]
+        with client_h2_conn.lock:
+            client_h2_conn.push_stream(parent_eid, event.pushed_stream_id, event.headers)
+            self.client_conn.send(client_h2_conn.data_to_send())
 
-        headers = mitmproxy.net.http.Headers([[k, v] for k, v in event.headers])
-        layer = Http2SingleStreamLayer(self, self.connections[self.client_conn], event.pushed_stream_id, headers)
+        headers = mitmproxy.net.http.Headers(event.headers)
+        layer = Http2SingleStreamLayer(self, client_h2_conn, event.pushed_stream_id, headers)
         self.streams[event.pushed_stream_id] = layer
-        self.streams[event.pushed_stream_id].timestamp_start = time.time()
-        self.streams[event.pushed_stream_id].pushed = True
-        self.streams[event.pushed_stream_id].parent_stream_id = parent_eid
-        self.streams[event.pushed_stream_id].timestamp_end = time.time()
-        self.streams[event.pushed_stream_id].request_message.arrived.set()
-        self.streams[event.pushed_stream_id].request_message.stream_ended.set()
-        self.streams[event.pushed_stream_id].start()
+        layer.timestamp_start = time.time()
+        layer.pushed = True
+        layer.parent_stream_id = parent_eid
+        layer.timestamp_end = time.time()
+        layer.request_message.arrived.set()
+        layer.request_message.stream_ended.set()
+        layer.start()
         return True
 
-    def _handle_priority_updated(self, eid, event):
+    def _handle_priority_updated(self, eid, event, source_conn, other_conn, is_server):
         if not self.config.options.http2_priority:
             self.log("HTTP/2 PRIORITY frame suppressed. Use --http2-priority to enable forwarding.", "debug")
             return True
 
-        if eid in self.streams and self.streams[eid].handled_priority_event is event:
+        stream = self.streams.get(eid)
+        if stream is not None and stream.handled_priority_event is event:
             # this event was already handled during stream creation
             # HeadersFrame + Priority information as RequestReceived
             return True
 
-        with self.connections[self.server_conn].lock:
+        server_h2_conn = self.connections[self.server_conn]
+        with server_h2_conn.lock:
             mapped_stream_id = event.stream_id
-            if mapped_stream_id in self.streams and self.streams[mapped_stream_id].server_stream_id:
+            mapped_stream = self.streams.get(mapped_stream_id)
+            if mapped_stream is not None and mapped_stream.server_stream_id:
                 # if the stream is already up and running and was sent to the server,
                 # use the mapped server stream id to update priority information
-                mapped_stream_id = self.streams[mapped_stream_id].server_stream_id
+                mapped_stream_id = mapped_stream.server_stream_id
 
-            if eid in self.streams:
-                self.streams[eid].priority_exclusive = event.exclusive
-                self.streams[eid].priority_depends_on = event.depends_on
-                self.streams[eid].priority_weight = event.weight
+            if stream is not None:
+                stream.priority_exclusive = event.exclusive
+                stream.priority_depends_on = event.depends_on
+                stream.priority_weight = event.weight
 
-            self.connections[self.server_conn].prioritize(
+            server_h2_conn.prioritize(
                 mapped_stream_id,
                 weight=event.weight,
                 depends_on=self._map_depends_on_stream_id(mapped_stream_id, event.depends_on),
                 exclusive=event.exclusive
             )
-            self.server_conn.send(self.connections[self.server_conn].data_to_send())
+            self.server_conn.send(server_h2_conn.data_to_send())
         return True
 
     def _map_depends_on_stream_id(self, stream_id, depends_on):
         mapped_depends_on = depends_on
-        if mapped_depends_on in self.streams and self.streams[mapped_depends_on].server_stream_id:
+        depends_on_stream = self.streams.get(mapped_depends_on)
+        if depends_on_stream is not None and depends_on_stream.server_stream_id:
             # if the depends-on-stream is already up and running and was sent to the server
             # use the mapped server stream id to update priority information
-            mapped_depends_on = self.streams[mapped_depends_on].server_stream_id
+            mapped_depends_on = depends_on_stream.server_stream_id
         if stream_id == mapped_depends_on:
             # looks like one of the streams wasn't opened yet
             # prevent self-dependent streams which result in ProtocolError
@@ -343,6 +365,39 @@ class Http2Layer(base.Layer):
         for stream in self.streams.values():
             stream.kill()
 
+    def _process_frame(self, source_conn, other_conn, is_server):
+        """
+        Reads and handles a single frame from source_conn.
+
+        Returns:
+            False if the layer should shut down.
+        """
+        source_h2_conn = self.connections[source_conn]
+        with source_h2_conn.lock:
+            try:
+                raw_frame = b''.join(http2.read_raw_frame(source_conn.rfile))
+            except:
+                # read frame failed: connection closed
+                self._kill_all_streams()
+                return False
+
+            if source_h2_conn.state_machine.state == h2.connection.ConnectionState.CLOSED:
+                self.log("HTTP/2 connection entered closed state already", "debug")
+                return False
+
+            incoming_events = source_h2_conn.receive_data(raw_frame)
+
+            for event in incoming_events:
+                if not self._handle_event(event, source_conn, other_conn, is_server):
+                    # connection terminated: GoAway
+                    source_conn.send(source_h2_conn.data_to_send())
+                    self._kill_all_streams()
+                    return False
+
+            # h2's own replies (SETTINGS and PING ACKs) and our WINDOW_UPDATEs go out in one write
+            source_conn.send(source_h2_conn.data_to_send())
+        return True
+
     def __call__(self):
         self._initiate_server_conn()
         self._complete_handshake()
@@ -350,33 +405,21 @@ class Http2Layer(base.Layer):
         conns = [c.connection for c in self.connections.keys()]
 
         try:
-            while True:
-                r = tcp.ssl_read_select(conns, 0.1)
-                for conn in r:
-                    source_conn = self.client_conn if conn == self.client_conn.connection else self.server_conn
-                    other_conn = self.server_conn if conn == self.client_conn.connection else self.client_conn
-                    is_server = (source_conn == self.server_conn)
-
-                    with self.connections[source_conn].lock:
-                        try:
-                            raw_frame = b''.join(http2.read_raw_frame(source_conn.rfile))
-                        except:
-                            # read frame failed: connection closed
-                            self._kill_all_streams()
-                            return
-
-                        if self.connections[source_conn].state_machine.state == h2.connection.ConnectionState.CLOSED:
-                            self.log("HTTP/2 connection entered closed state already", "debug")
-                            return
-
-                        incoming_events = self.connections[source_conn].receive_data(raw_frame)
-                        source_conn.send(self.connections[source_conn].data_to_send())
-
-                        for event in incoming_events:
-                            if not self._handle_event(event, source_conn, other_conn, is_server):
-                                # connection terminated: GoAway
-                                self._kill_all_streams()
+            with tcp.SSLReadSelector(conns) as selector:
+                while True:
+                    r = selector.select(0.1)
+                    for conn in r:
+                        source_conn = self.client_conn if conn == self.client_conn.connection else self.server_conn
+                        other_conn = self.server_conn if conn == self.client_conn.connection else self.client_conn
+                        is_server = (source_conn == self.server_conn)
+
+                        # drain all frames that have already been decrypted by the TLS layer
+                        # before going back to the selector.
+                        while True:
+                            if not self._process_frame(source_conn, other_conn, is_server):
                                 return
+                            if not tcp.ssl_pending(conn):
+                                break
 
                     self._cleanup_streams()
         except Exception as e:  # pragma: no cover
@@ -400,18 +443,25 @@ class Http2SingleStreamLayer(httpbase._HttpTransmissionLayer, basethread.BaseThr
     class Message:
         def __init__(self, headers=None):
             self.headers: Optional[mitmproxy.net.http.Headers] = headers  # headers are the first thing to be received on a new stream
-            self.data_queue: queue.Queue[bytes] = queue.Queue()  # contains raw contents of DATA frames
+            self.data_queue: Deque[bytes] = collections.deque()  # contains raw contents of DATA frames
+            self.data_available = threading.Event()  # set whenever new contents are appended to data_queue
             self.queued_data_length = 0  # used to enforce mitmproxy's config.options.body_size_limit
             self.trailers: Optional[mitmproxy.net.http.Headers] = None  # trailers are received after stream_ended is set
 
             self.arrived = threading.Event()  # indicates the HEADERS+CONTINUTATION frames have been received
             self.stream_ended = threading.Event()  # indicates the a frame with the END_STREAM flag has been received
 
+        def put_data(self, data: bytes) -> None:
+            self.data_queue.append(data)
+            self.data_available.set()
+
     def __init__(self, ctx, h2_connection, stream_id: int, request_headers: mitmproxy.net.http.Headers) -> None:
         super().__init__(
             ctx, name="Http2SingleStreamLayer-{}".format(stream_id)
         )
         self.h2_connection = h2_connection
+        # resolved once here instead of walking the context chain on every send
+        self.server_h2_connection: SafeH2Connection = self.connections[self.server_conn]
         self.zombie: Optional[float] = None
         self.client_stream_id: int = stream_id
         self.server_stream_id: Optional[int] = None
@@ -433,8 +483,10 @@ class Http2SingleStreamLayer(httpbase._HttpTransmissionLayer, basethread.BaseThr
             self.zombie = time.time()
             self.request_message.stream_ended.set()
             self.request_message.arrived.set()
+            self.request_message.data_available.set()
             self.response_message.arrived.set()
             self.response_message.stream_ended.set()
+            self.response_message.data_available.set()
 
     def connect(self):  # pragma: no cover
         raise exceptions.Http2ProtocolException("HTTP2 layer should already have a connection.")
@@ -450,12 +502,11 @@ class Http2SingleStreamLayer(httpbase._HttpTransmissionLayer, basethread.BaseThr
         # RFC 7540 8.1: An HTTP request/response exchange fully consumes a single stream.
         return True
 
-    @property
-    def data_queue(self):
+    def put_data(self, data: bytes) -> None:
         if self.response_message.arrived.is_set():
-            return self.response_message.data_queue
+            self.response_message.put_data(data)
         else:
-            return self.request_message.data_queue
+            self.request_message.put_data(data)
 
     @property
     def queued_data_length(self):
@@ -477,6 +528,13 @@ class Http2SingleStreamLayer(httpbase._HttpTransmissionLayer, basethread.BaseThr
         else:
             return self.request_message.stream_ended
 
+    @property
+    def data_available(self):
+        if self.response_message.arrived.is_set():
+            return self.response_message.data_available
+        else:
+            return self.request_message.data_available
+
     @property
     def trailers(self):
         if self.response_message.arrived.is_set():
@@ -506,11 +564,15 @@ class Http2SingleStreamLayer(httpbase._HttpTransmissionLayer, basethread.BaseThr
         if self.pushed:
             flow.metadata['h2-pushed-stream'] = True
 
+        pseudo_headers, fields = http2.split_pseudo_headers(
+            self.request_message.headers.fields, http2.REQUEST_PSEUDO_HEADERS
+        )
         # pseudo header must be present, see https://http2.github.io/http2-spec/#rfc.section.8.1.2.3
-        authority = self.request_message.headers.pop(':authority', "")
-        method = self.request_message.headers.pop(':method')
-        scheme = self.request_message.headers.pop(':scheme')
-        path = self.request_message.headers.pop(':path')
+        authority = pseudo_headers.get(b':authority', b"")
+        method = pseudo_headers[b':method']
+        scheme = pseudo_headers[b':scheme']
+        path = pseudo_headers[b':path']
+        self.request_message.headers = mitmproxy.net.http.Headers(fields)
 
         host, port = url.parse_authority(authority, check=True)
         port = port or url.default_port(scheme) or 0
@@ -518,10 +580,10 @@ class Http2SingleStreamLayer(httpbase._HttpTransmissionLayer, basethread.BaseThr
         return http.HTTPRequest(
             host,
             port,
-            method.encode(),
-            scheme.encode(),
-            authority.encode(),
-            path.encode(),
+            method,
+            scheme,
+            authority,
+            path,
             b"HTTP/2.0",
             self.request_message.headers,
             None,
@@ -536,14 +598,14 @@ class Http2SingleStreamLayer(httpbase._HttpTransmissionLayer, basethread.BaseThr
             self.request_message.stream_ended.wait()
 
         while True:
-            try:
-                yield self.request_message.data_queue.get(timeout=0.1)
-            except queue.Empty:  # pragma: no cover
-                pass
+            self.request_message.data_available.wait(timeout=0.1)
+            self.request_message.data_available.clear()
+            while self.request_message.data_queue:
+                yield self.request_message.data_queue.popleft()
             if self.request_message.stream_ended.is_set():
                 self.raise_zombie()
-                while self.request_message.data_queue.qsize() > 0:
-                    yield self.request_message.data_queue.get()
+                while self.request_message.data_queue:
+                    yield self.request_message.data_queue.popleft()
                 break
             self.raise_zombie()
 
@@ -559,12 +621,12 @@ class Http2SingleStreamLayer(httpbase._HttpTransmissionLayer, basethread.BaseThr
 
         while True:
             self.raise_zombie()
-            self.connections[self.server_conn].lock.acquire()
+            self.server_h2_connection.lock.acquire()
 
-            max_streams = self.connections[self.server_conn].remote_settings.max_concurrent_streams
-            if self.connections[self.server_conn].open_outbound_streams + 1 >= max_streams:
+            max_streams = self.server_h2_connection.remote_settings.max_concurrent_streams
+            if self.server_h2_connection.open_outbound_streams + 1 >= max_streams:
                 # wait until we get a free slot for a new outgoing stream
-                self.connections[self.server_conn].lock.release()
+                self.server_h2_connection.lock.release()
                 time.sleep(0.1)
                 continue
 
@@ -574,7 +636,7 @@ class Http2SingleStreamLayer(httpbase._HttpTransmissionLayer, basethread.BaseThr
         # We must not assign a stream id if we are already a zombie.
         self.raise_zombie()
 
-        self.server_stream_id = self.connections[self.server_conn].get_next_available_stream_id()
+        self.server_stream_id = self.server_h2_connection.get_next_available_stream_id()
         self.server_to_client_stream_ids[self.server_stream_id] = self.client_stream_id
 
         headers = request.headers.copy()
@@ -598,7 +660,7 @@ class Http2SingleStreamLayer(httpbase._HttpTransmissionLayer, basethread.BaseThr
                 priority_weight = self.priority_weight
 
         try:
-            self.connections[self.server_conn].safe_send_headers(
+            self.server_h2_connection.safe_send_headers(
                 self.raise_zombie,
                 self.server_stream_id,
                 headers,
@@ -610,7 +672,7 @@ class Http2SingleStreamLayer(httpbase._HttpTransmissionLayer, basethread.BaseThr
             raise e
         finally:
             self.raise_zombie()
-            self.connections[self.server_conn].lock.release()
+            self.server_h2_connection.lock.release()
 
     @detect_zombie_stream
     def send_request_body(self, request, chunks):
@@ -618,7 +680,7 @@ class Http2SingleStreamLayer(httpbase._HttpTransmissionLayer, basethread.BaseThr
             # nothing to do here
             return
 
-        self.connections[self.server_conn].safe_send_body(
+        self.server_h2_connection.safe_send_body(
             self.raise_zombie,
             self.server_stream_id,
             chunks,
@@ -627,7 +689,7 @@ class Http2SingleStreamLayer(httpbase._HttpTransmissionLayer, basethread.BaseThr
 
     @detect_zombie_stream
     def send_request_trailers(self, request):
-        self._send_trailers(self.server_conn, request.trailers)
+        self._send_trailers(self.server_h2_connection, request.trailers)
 
     @detect_zombie_stream
     def send_request(self, request):
@@ -641,9 +703,11 @@ class Http2SingleStreamLayer(httpbase._HttpTransmissionLayer, basethread.BaseThr
 
         self.raise_zombie()
 
-        status_code = int(self.response_message.headers.get(':status', 502))
-        headers = self.response_message.headers.copy()
-        headers.pop(":status", None)
+        pseudo_headers, fields = http2.split_pseudo_headers(
+            self.response_message.headers.fields, http2.RESPONSE_PSEUDO_HEADERS
+        )
+        status_code = int(pseudo_headers.get(b':status', 502))
+        headers = mitmproxy.net.http.Headers(fields)
 
         return http.HTTPResponse(
             http_version=b"HTTP/2.0",
@@ -659,14 +723,14 @@ class Http2SingleStreamLayer(httpbase._HttpTransmissionLayer, basethread.BaseThr
     @detect_zombie_stream
     def read_response_body(self, request, response):
         while True:
-            try:
-                yield self.response_message.data_queue.get(timeout=0.1)
-            except queue.Empty:  # pragma: no cover
-                pass
+            self.response_message.data_available.wait(timeout=0.1)
+            self.response_message.data_available.clear()
+            while self.response_message.data_queue:
+                yield self.response_message.data_queue.popleft()
             if self.response_message.stream_ended.is_set():
                 self.raise_zombie()
-                while self.response_message.data_queue.qsize() > 0:
-                    yield self.response_message.data_queue.get()
+                while self.response_message.data_queue:
+                    yield self.response_message.data_queue.popleft()
                 break
             self.raise_zombie()
 
@@ -678,16 +742,15 @@ class Http2SingleStreamLayer(httpbase._HttpTransmissionLayer, basethread.BaseThr
     def send_response_headers(self, response):
         headers = response.headers.copy()
         headers.insert(0, ":status", str(response.status_code))
-        with self.connections[self.client_conn].lock:
-            self.connections[self.client_conn].safe_send_headers(
-                self.raise_zombie,
-                self.client_stream_id,
-                headers
-            )
+        self.h2_connection.safe_send_headers(
+            self.raise_zombie,
+            self.client_stream_id,
+            headers
+        )
 
     @detect_zombie_stream
     def send_response_body(self, response, chunks):
-        self.connections[self.client_conn].safe_send_body(
+        self.h2_connection.safe_send_body(
             self.raise_zombie,
             self.client_stream_id,
             chunks,
@@ -696,18 +759,17 @@ class Http2SingleStreamLayer(httpbase._HttpTransmissionLayer, basethread.BaseThr
 
     @detect_zombie_stream
     def send_response_trailers(self, response):
-        self._send_trailers(self.client_conn, response.trailers)
+        self._send_trailers(self.h2_connection, response.trailers)
 
-    def _send_trailers(self, conn, trailers):
+    def _send_trailers(self, h2_connection, trailers):
         if not trailers:
             return
-        with self.connections[conn].lock:
-            self.connections[conn].safe_send_headers(
-                self.raise_zombie,
-                self.client_stream_id,
-                trailers,
-                end_stream=True
-            )
+        h2_connection.safe_send_headers(
+            self.raise_zombie,
+            self.client_stream_id,
+            trailers,
+            end_stream=True
+        )
 
     def __call__(self):  # pragma: no cover
         raise EnvironmentError('Http2SingleStreamLayer must be run as thread')
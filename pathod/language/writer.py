@@ -11,6 +11,9 @@ def send_chunk(fp, val, blocksize, start, end):
     """
         (start, end): Inclusive lower bound, exclusive upper bound.
     """
+    if isinstance(val, bytes):
+        # slicing a memoryview does not copy the block before it is written
+        val = memoryview(val)
     for i in range(start, end, blocksize):
         fp.write(
             val[i:min(i + blocksize, end)]
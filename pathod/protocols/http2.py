@@ -1,4 +1,5 @@
 import itertools
+import struct
 import time
 
 import hyperframe.frame
@@ -9,6 +10,7 @@ import mitmproxy.net.http.request
 import mitmproxy.net.http.response
 from mitmproxy.coretypes import bidi
 from mitmproxy.net.http import http2, url
+from mitmproxy.net.http.http2 import hpack_table
 from .. import language
 
 
@@ -19,6 +21,10 @@ class TCPHandler:
         self.wfile = wfile
 
 
+# 24 bit length, type, flags and stream id of a frame header, as hyperframe packs it
+_FRAME_HEADER = struct.Struct(">HBBBL")
+
+
 class HTTP2StateProtocol:
 
     ERROR_CODES = bidi.BiDi(
@@ -40,6 +46,14 @@ class HTTP2StateProtocol:
 
     CLIENT_CONNECTION_PREFACE = b'PRI * HTTP/2.0\r\n\r\nSM\r\n\r\n'
 
+    # these frames never change, so they are serialized only once
+    SETTINGS_ACK = hyperframe.frame.SettingsFrame(flags=['ACK']).serialize()
+    SERVER_PREFACE_SETTINGS = hyperframe.frame.SettingsFrame(settings={
+        hyperframe.frame.SettingsFrame.ENABLE_PUSH: 0,
+        hyperframe.frame.SettingsFrame.MAX_CONCURRENT_STREAMS: 1,
+    }).serialize()
+    CLIENT_PREFACE_SETTINGS = CLIENT_CONNECTION_PREFACE + hyperframe.frame.SettingsFrame().serialize()
+
     HTTP2_DEFAULT_SETTINGS = {
         hyperframe.frame.SettingsFrame.HEADER_TABLE_SIZE: 4096,
         hyperframe.frame.SettingsFrame.ENABLE_PUSH: 1,
@@ -63,7 +77,10 @@ class HTTP2StateProtocol:
         self.tcp_handler = tcp_handler or TCPHandler(rfile, wfile)
         self.is_server = is_server
         self.dump_frames = dump_frames
-        self.encoder = encoder or Encoder()
+        if encoder is None:
+            encoder = Encoder()
+            encoder.header_table = hpack_table.IndexedHeaderTable()
+        self.encoder = encoder
         self.decoder = decoder or Decoder()
         self.unhandled_frame_cb = unhandled_frame_cb
 
@@ -234,29 +251,27 @@ class HTTP2StateProtocol:
             magic = self.tcp_handler.rfile.safe_read(magic_length)
             assert magic == self.CLIENT_CONNECTION_PREFACE
 
-            frm = hyperframe.frame.SettingsFrame(settings={
-                hyperframe.frame.SettingsFrame.ENABLE_PUSH: 0,
-                hyperframe.frame.SettingsFrame.MAX_CONCURRENT_STREAMS: 1,
-            })
-            self.send_frame(frm, hide=True)
+            self._send_raw(self.SERVER_PREFACE_SETTINGS)
             self._receive_settings(hide=True)
 
     def perform_client_connection_preface(self, force=False):
         if force or not self.connection_preface_performed:
             self.connection_preface_performed = True
 
-            self.tcp_handler.wfile.write(self.CLIENT_CONNECTION_PREFACE)
-
-            self.send_frame(hyperframe.frame.SettingsFrame(), hide=True)
+            # magic and empty settings frame go out in a single write
+            self._send_raw(self.CLIENT_PREFACE_SETTINGS)
             self._receive_settings(hide=True)  # server announces own settings
             self._receive_settings(hide=True)  # server acks my settings
 
-    def send_frame(self, frm, hide=False):
-        raw_bytes = frm.serialize()
+    def send_frame(self, *frms, hide=False):
+        self._send_raw(b''.join(frm.serialize() for frm in frms))
+        if not hide and self.dump_frames:  # pragma: no cover
+            for frm in frms:
+                print(">> " + repr(frm))
+
+    def _send_raw(self, raw_bytes):
         self.tcp_handler.wfile.write(raw_bytes)
         self.tcp_handler.wfile.flush()
-        if not hide and self.dump_frames:  # pragma: no cover
-            print(">> " + repr(frm))
 
     def read_frame(self, hide=False):
         while True:
@@ -265,9 +280,7 @@ class HTTP2StateProtocol:
                 print("<< " + repr(frm))
 
             if isinstance(frm, hyperframe.frame.PingFrame):
-                raw_bytes = hyperframe.frame.PingFrame(flags=['ACK'], payload=frm.payload).serialize()
-                self.tcp_handler.wfile.write(raw_bytes)
-                self.tcp_handler.wfile.flush()
+                self._send_raw(hyperframe.frame.PingFrame(flags=['ACK'], payload=frm.payload).serialize())
                 continue
             if isinstance(frm, hyperframe.frame.SettingsFrame) and 'ACK' not in frm.flags:
                 self._apply_settings(frm.settings, hide)
@@ -315,14 +328,15 @@ class HTTP2StateProtocol:
                 old_value = '-'
             self.http2_settings[setting] = value
 
-        frm = hyperframe.frame.SettingsFrame(flags=['ACK'])
-        self.send_frame(frm, hide)
+        self._send_raw(self.SETTINGS_ACK)
+        if not hide and self.dump_frames:  # pragma: no cover
+            print(">> " + repr(hyperframe.frame.SettingsFrame(flags=['ACK'])))
 
     def _update_flow_control_window(self, stream_id, increment):
-        frm = hyperframe.frame.WindowUpdateFrame(stream_id=0, window_increment=increment)
-        self.send_frame(frm)
-        frm = hyperframe.frame.WindowUpdateFrame(stream_id=stream_id, window_increment=increment)
-        self.send_frame(frm)
+        self.send_frame(
+            hyperframe.frame.WindowUpdateFrame(stream_id=0, window_increment=increment),
+            hyperframe.frame.WindowUpdateFrame(stream_id=stream_id, window_increment=increment),
+        )
 
     def _create_headers(self, headers, stream_id, end_stream=True):
         def frame_cls(chunks):
@@ -355,19 +369,22 @@ class HTTP2StateProtocol:
         if body is None or len(body) == 0:
             return b''
 
+        # DATA frames carry neither padding nor priority information here, so we pack
+        # their headers directly instead of building a hyperframe.frame.DataFrame per chunk.
         chunk_size = self.http2_settings[hyperframe.frame.SettingsFrame.MAX_FRAME_SIZE]
-        chunks = range(0, len(body), chunk_size)
-        frms = [hyperframe.frame.DataFrame(
-            flags=[],
-            stream_id=stream_id,
-            data=body[i:i + chunk_size]) for i in chunks]
-        frms[-1].flags.add('END_STREAM')
+        view = memoryview(body)
+        frms = []
+        for i in range(0, len(view), chunk_size):
+            chunk = view[i:i + chunk_size]
+            flags = 0x1 if i + chunk_size >= len(view) else 0x0  # END_STREAM on the last frame
+            header = _FRAME_HEADER.pack(len(chunk) >> 8, len(chunk) & 0xFF, 0x0, flags, stream_id & 0x7FFFFFFF)
+            frms.append(header + chunk)
 
         if self.dump_frames:  # pragma: no cover
             for frm in frms:
-                print(">> ", repr(frm))
+                print(">> ", repr(http2.parse_frame(frm)))
 
-        return [frm.serialize() for frm in frms]
+        return frms
 
     def _receive_transmission(self, stream_id=None, include_body=True):
         if not include_body:
@@ -375,8 +392,9 @@ class HTTP2StateProtocol:
 
         body_expected = True
 
-        header_blocks = b''
-        body = b''
+        # collect fragments and join them once instead of growing a bytes object frame by frame
+        header_block_fragments = []
+        body_chunks = []
 
         while True:
             frm = self.read_frame()
@@ -385,7 +403,7 @@ class HTTP2StateProtocol:
                 (stream_id is None or frm.stream_id == stream_id)
             ):
                 stream_id = frm.stream_id
-                header_blocks += frm.data
+                header_block_fragments.append(frm.data)
                 if 'END_STREAM' in frm.flags:
                     body_expected = False
                 if 'END_HEADERS' in frm.flags:
@@ -396,17 +414,17 @@ class HTTP2StateProtocol:
         while body_expected:
             frm = self.read_frame()
             if isinstance(frm, hyperframe.frame.DataFrame) and frm.stream_id == stream_id:
-                body += frm.data
+                body_chunks.append(frm.data)
                 if 'END_STREAM' in frm.flags:
                     break
             else:
                 self._handle_unexpected_frame(frm)
 
         headers = mitmproxy.net.http.headers.Headers(
-            [[k, v] for k, v in self.decoder.decode(header_blocks, raw=True)]
+            self.decoder.decode(b''.join(header_block_fragments), raw=True)
         )
 
-        return stream_id, headers, body
+        return stream_id, headers, b''.join(body_chunks)
 
 
 class HTTP2Protocol:
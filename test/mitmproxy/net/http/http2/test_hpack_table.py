@@ -0,0 +1,44 @@
+import random
+
+import hpack
+from hpack.table import HeaderTable
+
+from mitmproxy.net.http.http2.hpack_table import IndexedHeaderTable
+
+NAMES = [b":path", b":authority", b"cookie", b"x-foo", b"x-bar"]
+VALUES = [b"", b"/", b"bar", b"example.com", b"a" * 100]
+
+
+def test_search_matches_header_table():
+    rnd = random.Random(42)
+    plain = HeaderTable()
+    indexed = IndexedHeaderTable()
+    for _ in range(2000):
+        name = rnd.choice(NAMES)
+        value = rnd.choice(VALUES)
+        assert indexed.search(name, value) == plain.search(name, value)
+        if rnd.random() < 0.02:
+            size = rnd.choice([0, 64, 256, 4096])
+            plain.maxsize = size
+            indexed.maxsize = size
+        else:
+            plain.add(name, value)
+            indexed.add(name, value)
+        assert indexed.dynamic_entries == plain.dynamic_entries
+
+
+def test_oversized_entry():
+    t = IndexedHeaderTable()
+    t.add(b"x-foo", b"bar")
+    t.add(b"x-foo", b"a" * 5000)
+    assert not t.dynamic_entries
+    assert t.search(b"x-foo", b"bar") is None
+
+
+def test_encoder():
+    headers = [(b":method", b"GET"), (b":path", b"/"), (b"cookie", b"foo"), (b"x-foo", b"bar")]
+    plain = hpack.Encoder()
+    indexed = hpack.Encoder()
+    indexed.header_table = IndexedHeaderTable()
+    for _ in range(3):
+        assert indexed.encode(headers) == plain.encode(headers)
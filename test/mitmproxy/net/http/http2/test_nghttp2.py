@@ -0,0 +1,149 @@
+from unittest import mock
+
+import hpack
+import pytest
+from hpack import HeaderTuple, NeverIndexedHeaderTuple
+
+from mitmproxy.net.http.http2 import nghttp2
+
+requires_nghttp2 = pytest.mark.skipif(not nghttp2.available, reason="nghttp2 is not available")
+
+HEADERS = [
+    (b":method", b"GET"),
+    (b":path", b"/index.html"),
+    (b":scheme", b"https"),
+    (b"user-agent", b"mitmproxy"),
+    (b"x-empty", b""),
+    (b"x-utf8", "üñí".encode()),
+]
+
+
+@requires_nghttp2
+@pytest.mark.parametrize("encoder_cls, decoder_cls", [
+    (nghttp2.Encoder, hpack.Decoder),
+    (hpack.Encoder, nghttp2.Decoder),
+    (nghttp2.Encoder, nghttp2.Decoder),
+])
+def test_roundtrip(encoder_cls, decoder_cls):
+    e = encoder_cls()
+    d = decoder_cls()
+    # repeat to exercise the dynamic tables on both ends
+    for _ in range(3):
+        assert d.decode(e.encode(HEADERS), raw=True) == HEADERS
+
+
+@requires_nghttp2
+def test_sensitive():
+    e = nghttp2.Encoder()
+    d = nghttp2.Decoder()
+    headers = d.decode(e.encode([
+        (b"cookie", b"foo", True),
+        NeverIndexedHeaderTuple(b"authorization", b"secret"),
+        HeaderTuple(b"x-foo", b"bar"),
+    ]), raw=True)
+    assert headers == [(b"cookie", b"foo"), (b"authorization", b"secret"), (b"x-foo", b"bar")]
+    assert [type(h) for h in headers] == [NeverIndexedHeaderTuple, NeverIndexedHeaderTuple, HeaderTuple]
+
+
+@requires_nghttp2
+def test_decode_str():
+    e = nghttp2.Encoder()
+    d = nghttp2.Decoder()
+    assert d.decode(e.encode([("x-utf8", "üñí")])) == [("x-utf8", "üñí")]
+    with pytest.raises(hpack.HPACKDecodingError):
+        d.decode(e.encode([(b"x-invalid", b"\xff")]))
+
+
+@requires_nghttp2
+def test_decode_empty():
+    assert nghttp2.Decoder().decode(b"", raw=True) == []
+
+
+@requires_nghttp2
+def test_decode_invalid():
+    with pytest.raises(hpack.HPACKDecodingError):
+        # index 127 does not exist
+        nghttp2.Decoder().decode(b"\xff\x40", raw=True)
+
+
+@requires_nghttp2
+def test_max_header_list_size():
+    d = nghttp2.Decoder(max_header_list_size=64)
+    with pytest.raises(hpack.OversizedHeaderListError):
+        d.decode(hpack.Encoder().encode([(b"x-foo", b"a" * 64)]), raw=True)
+
+
+@requires_nghttp2
+def test_header_table_size():
+    e = nghttp2.Encoder()
+    d = hpack.Decoder()
+    assert e.header_table_size == 4096
+    e.header_table_size = 0
+    assert e.header_table_size == 0
+    assert d.decode(e.encode(HEADERS), raw=True) == HEADERS
+    assert d.header_table_size == 0
+
+    # nghttp2 does not grow the table beyond its initial size
+    e.header_table_size = 8192
+    assert e.header_table_size == 4096
+    assert d.decode(e.encode(HEADERS), raw=True) == HEADERS
+
+
+@requires_nghttp2
+def test_max_allowed_table_size():
+    e = hpack.Encoder()
+    d = nghttp2.Decoder()
+    assert d.max_allowed_table_size == 4096
+    d.max_allowed_table_size = 256
+    e.header_table_size = 256
+    assert d.decode(e.encode(HEADERS), raw=True) == HEADERS
+
+    e.header_table_size = 1024
+    with pytest.raises(hpack.HPACKDecodingError):
+        d.decode(e.encode(HEADERS), raw=True)
+
+
+@requires_nghttp2
+def test_max_allowed_table_size_mid_block():
+    d = nghttp2.Decoder()
+    data = hpack.Encoder().encode(HEADERS)
+    # leave the inflater in the middle of a header block
+    buf = nghttp2.ffi.from_buffer("uint8_t[]", data)
+    assert nghttp2.lib.nghttp2_hd_inflate_hd2(d._inflater, d._nv, d._inflate_flags, buf, 1, 0) >= 0
+    with pytest.raises(hpack.HPACKError):
+        d.max_allowed_table_size = 256
+
+
+def test_to_bytes():
+    assert nghttp2._to_bytes(b"foo") == b"foo"
+    assert nghttp2._to_bytes("üñí") == "üñí".encode()
+
+
+class TestLoad:
+    def test_no_cffi(self, monkeypatch):
+        monkeypatch.setattr(nghttp2, "cffi", None)
+        assert nghttp2._load() == (None, None)
+
+    def test_no_library(self, monkeypatch):
+        monkeypatch.setattr(nghttp2.ctypes.util, "find_library", lambda name: None)
+        assert nghttp2._load() == (None, None)
+
+    @pytest.mark.parametrize("dlopen", [
+        mock.Mock(side_effect=OSError),
+        # a library that lacks nghttp2_hd_inflate_hd2
+        mock.Mock(return_value=object()),
+    ])
+    def test_unusable_library(self, monkeypatch, dlopen):
+        monkeypatch.setattr(nghttp2, "cffi", mock.Mock())
+        nghttp2.cffi.FFI.return_value.dlopen = dlopen
+        monkeypatch.setattr(nghttp2.ctypes.util, "find_library", lambda name: "libnghttp2.so")
+        assert nghttp2._load() == (None, None)
+
+    def test_load(self, monkeypatch):
+        monkeypatch.setattr(nghttp2, "cffi", mock.Mock())
+        monkeypatch.setattr(nghttp2.ctypes.util, "find_library", lambda name: "libnghttp2.so")
+        ffi, lib = nghttp2._load()
+        assert ffi is nghttp2.cffi.FFI.return_value
+        ffi.cdef.assert_called_once_with(nghttp2.CDEF)
+        ffi.dlopen.assert_called_once_with("libnghttp2.so")
+        assert lib is ffi.dlopen.return_value
@@ -1,6 +1,7 @@
 import pytest
 
-from mitmproxy.net.http.http2 import parse_headers
+from mitmproxy.net.http.http2 import parse_headers, split_pseudo_headers
+from mitmproxy.net.http.http2 import REQUEST_PSEUDO_HEADERS, RESPONSE_PSEUDO_HEADERS
 
 
 class TestHttp2ParseHeaders:
@@ -68,3 +69,24 @@ class TestHttp2ParseHeaders:
 
         with pytest.raises(NotImplementedError):
             parse_headers(h)
+
+
+def test_split_pseudo_headers():
+    pseudo_headers, fields = split_pseudo_headers((
+        (b':method', b'GET'),
+        (b':path', b'/'),
+        (b':protocol', b'websocket'),
+        (b'user-agent', b'foo'),
+        (b'cookie', b'a=b'),
+        (b':Path', b'/other'),
+        (b'cookie', b'c=d'),
+    ), REQUEST_PSEUDO_HEADERS)
+    assert pseudo_headers == {b':method': b'GET', b':path': b'/, /other'}
+    # unknown pseudo-headers are left alone
+    assert fields == ((b':protocol', b'websocket'), (b'user-agent', b'foo'), (b'cookie', b'a=b'), (b'cookie', b'c=d'))
+
+    pseudo_headers, fields = split_pseudo_headers(((b':status', b'200'), (b'server', b'foo')), RESPONSE_PSEUDO_HEADERS)
+    assert pseudo_headers == {b':status': b'200'}
+    assert fields == ((b'server', b'foo'),)
+
+    assert split_pseudo_headers((), REQUEST_PSEUDO_HEADERS) == ({}, ())
@@ -782,6 +782,24 @@ class TestFileLike:
             s.safe_read(10)
 
 
+class TestSSLReadSelector:
+    def test_select(self):
+        a, b = socket.socketpair()
+        with a, b, tcp.SSLReadSelector([a, b]) as selector:
+            assert selector.select(0) == []
+            b.send(b"foo")
+            assert selector.select(1) == [a]
+
+    def test_ssl_pending(self):
+        conn = mock.Mock(spec=SSL.Connection)
+        conn.pending.return_value = 0
+        assert not tcp.ssl_pending(conn)
+        conn.pending.return_value = 42
+        assert tcp.ssl_pending(conn)
+        with socket.socket() as sock:
+            assert not tcp.ssl_pending(sock)
+
+
 class TestPeek(tservers.ServerTestBase):
     handler = EchoHandler
 
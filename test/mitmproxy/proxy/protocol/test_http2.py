@@ -4,6 +4,7 @@
 import os
 import tempfile
 import traceback
+from unittest import mock
 import pytest
 import h2
 
@@ -14,6 +15,8 @@ import mitmproxy.http
 from ...net import tservers as net_tservers
 from mitmproxy import exceptions
 from mitmproxy.net.http import http1, http2
+from mitmproxy.net.http.http2 import hpack_table, nghttp2
+from mitmproxy.proxy.protocol.http2 import Http2SingleStreamLayer, SafeH2Connection
 from pathod.language import generators
 
 from ... import tservers
@@ -30,6 +33,48 @@ logging.getLogger("passlib.registry").setLevel(logging.WARNING)
 #       print(msg)
 
 
+@pytest.mark.parametrize("use_nghttp2", [True, False])
+def test_hpack_backend(use_nghttp2):
+    conn = SafeH2Connection(None, use_nghttp2=use_nghttp2)
+    if use_nghttp2 and nghttp2.available:
+        assert isinstance(conn.encoder, nghttp2.Encoder)
+        assert isinstance(conn.decoder, nghttp2.Decoder)
+    else:
+        assert isinstance(conn.encoder.header_table, hpack_table.IndexedHeaderTable)
+
+
+def test_safe_send_body_batches():
+    conn = mock.Mock()
+    h2_conn = SafeH2Connection(conn, config=h2.config.H2Configuration(client_side=True))
+    h2_conn.MAX_BATCH_SIZE = 2 ** 15
+    h2_conn.initiate_connection()
+    h2_conn.send_headers(1, [(':method', 'GET'), (':path', '/'), (':scheme', 'https'), (':authority', 'example.com')])
+    h2_conn.data_to_send()
+
+    h2_conn.safe_send_body(lambda *args: None, 1, [b"x" * 60000], end_stream=False)
+    # the body is written in batches of at most MAX_BATCH_SIZE bytes
+    sizes = [len(c[0][0]) for c in conn.send.call_args_list]
+    assert sizes == [2 * (9 + 2 ** 14), 9 + 2 ** 14 + 9 + (60000 - 3 * 2 ** 14)]
+
+
+def test_read_request_headers_idna():
+    layer = Http2SingleStreamLayer(mock.MagicMock(), mock.Mock(), 1, mitmproxy.net.http.Headers([
+        (b':authority', b'xn--bcher-kva.example:8443'),
+        (b':method', b'GET'),
+        (b':scheme', b'https'),
+        (b':path', b'/'),
+        (b'x-foo', b'bar'),
+    ]))
+    layer.timestamp_start = layer.timestamp_end = 1.0
+    layer.request_message.arrived.set()
+    request = layer.read_request_headers(mock.Mock())
+    # the host is IDNA-decoded like in HTTP/1, the authority is kept as received
+    assert request.host == "bücher.example"
+    assert request.port == 8443
+    assert request.data.authority == b'xn--bcher-kva.example:8443'
+    assert request.headers.fields == ((b'x-foo', b'bar'),)
+
+
 class _Http2ServerBase(net_tservers.ServerTestBase):
     ssl = dict(alpn_select=b'h2')
 
@@ -111,6 +156,15 @@ class _Http2TestBase:
     def master(self):
         return self.proxy.tmaster
 
+    @pytest.fixture(autouse=True, params=["nghttp2", "hpack"])
+    def hpack_backend(self, request):
+        # run every test with both HPACK implementations the proxy may use
+        if request.param == "nghttp2" and not nghttp2.available:
+            pytest.skip("nghttp2 is not available")
+        self.options.http2_nghttp2 = (request.param == "nghttp2")
+        yield request.param
+        self.options.http2_nghttp2 = True
+
     def setup(self):
         self.master.reset([])
         self.server.server.handle_server_event = self.handle_server_event
@@ -195,6 +249,10 @@ class _Http2Test(_Http2TestBase, _Http2ServerBase):
 class TestSimple(_Http2Test):
     request_body_buffer = b''
 
+    def setup(self):
+        super().setup()
+        TestSimple.request_body_buffer = b''
+
     @classmethod
     def handle_server_event(cls, event, h2_conn, rfile, wfile):
         if isinstance(event, h2.events.ConnectionTerminated):
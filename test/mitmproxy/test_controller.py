@@ -1,5 +1,4 @@
 import asyncio
-import queue
 import pytest
 
 from mitmproxy.exceptions import Kill, ControlException
@@ -37,32 +36,35 @@ class TestReply:
         reply.take()
         assert reply.state == "taken"
 
-        with pytest.raises(queue.Empty):
-            reply.q.get_nowait()
+        assert not reply.committed.is_set()
         reply.commit()
         assert reply.state == "committed"
-        assert reply.q.get() == "foo"
+        assert reply.committed.is_set()
+        assert reply.value == "foo"
 
     def test_kill(self):
         reply = controller.Reply(43)
         reply.kill()
         reply.take()
         reply.commit()
-        assert reply.q.get() == Kill
+        assert reply.committed.is_set()
+        assert reply.value == Kill
 
     def test_ack(self):
         reply = controller.Reply(44)
         reply.ack()
         reply.take()
         reply.commit()
-        assert reply.q.get() == 44
+        assert reply.committed.is_set()
+        assert reply.value == 44
 
     def test_reply_none(self):
         reply = controller.Reply(45)
         reply.send(None)
         reply.take()
         reply.commit()
-        assert reply.q.get() is None
+        assert reply.committed.is_set()
+        assert reply.value is None
 
     def test_commit_no_reply(self):
         reply = controller.Reply(46)
@@ -129,8 +131,10 @@ class TestDummyReply:
         reply.commit()
         reply.mark_reset()
         assert reply.state == "committed"
+        assert reply.committed.is_set()
         reply.reset()
         assert reply.state == "start"
+        assert not reply.committed.is_set()
 
     def test_del(self):
         reply = controller.DummyReply()
@@ -1,3 +1,4 @@
+import io
 from unittest import mock
 
 import hyperframe
@@ -162,6 +163,15 @@ class TestPerformClientConnectionPreface(net_tservers.ServerTestBase):
             protocol.perform_client_connection_preface()
             assert protocol.connection_preface_performed
 
+    def test_single_write(self):
+        rfile = tcp.Reader(io.BytesIO(bytes.fromhex("000000040000000000" "000000040100000000")))
+        wfile = mock.Mock()
+        protocol = HTTP2StateProtocol(rfile=rfile, wfile=wfile)
+        protocol.perform_client_connection_preface()
+        assert wfile.write.call_args_list[0] == mock.call(
+            HTTP2StateProtocol.CLIENT_CONNECTION_PREFACE + bytes.fromhex("000000040000000000")
+        )
+
 
 class TestClientStreamIds:
     c = tcp.TCPClient(("127.0.0.1", 0))
@@ -224,6 +234,19 @@ class TestApplySettings(net_tservers.ServerTestBase):
                 hyperframe.frame.SettingsFrame.INITIAL_WINDOW_SIZE] == 'deadbeef'
 
 
+class TestUpdateFlowControlWindow:
+    def test_update_flow_control_window(self):
+        wfile = mock.Mock()
+        protocol = HTTP2StateProtocol(rfile=None, wfile=wfile)
+        protocol._update_flow_control_window(1, 42)
+        # connection and stream window updates are written at once
+        wfile.write.assert_called_once_with(bytes.fromhex(
+            "0000040800000000000000002a"
+            "0000040800000000010000002a"
+        ))
+        assert wfile.flush.call_count == 1
+
+
 class TestCreateHeaders:
     c = tcp.TCPClient(("127.0.0.1", 0))
 